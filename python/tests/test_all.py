@@ -1,3 +1,4 @@
+import pytest
 import tipping
 
 
@@ -38,4 +39,165 @@ def test_tokenizer():
             "12", 
     ]
     tokenizer = tipping.Tokenizer(special_whites, special_blacks, symbols)
-    assert tokenizer.tokenize(msg) == expected
\ No newline at end of file
+    assert tokenizer.tokenize(msg) == expected
+
+
+def test_tokenizer_duplicate_patterns():
+    msg = "Fan fan_2 speed is set to 12.3114 on machine sys.node.fan_3 on node 12"
+    single = tipping.Tokenizer([r"fan_\d+"], [r"\d+\.\d+"], ".")
+    repeated = tipping.Tokenizer(
+        [r"fan_\d+", r"fan_\d+"], [r"\d+\.\d+", r"\d+\.\d+"], "."
+    )
+    assert repeated.tokenize(msg) == single.tokenize(msg)
+
+
+def test_parse_n_threads():
+    messages = [
+        "Fan fan_1 speed is set to 12.3114 on machine node_1",
+        "Fan fan_2 speed is set to 9.1 on machine node_2",
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+    ]
+    assert tipping.parse(messages, n_threads=1) == tipping.parse(messages)
+    assert tipping.parse(messages, n_threads=2) == tipping.parse(messages)
+    assert tipping.parse(messages, n_threads=2) == tipping.parse(messages)
+    with pytest.raises(ValueError):
+        tipping.parse(messages, n_threads=0)
+
+
+def test_parse_reuses_cached_tokenizer():
+    messages = [
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+    ]
+    tipping.parse(messages, special_whites=[r"alice|bob"])
+    hits = tipping._build_tokenizer.cache_info().hits
+    tipping.parse(messages, special_whites=[r"alice|bob"])
+    assert tipping._build_tokenizer.cache_info().hits == hits + 1
+
+
+def test_parse_template_ids():
+    messages = [
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+    ]
+    clusters, masks, templates = tipping.parse(messages)
+    ids_clusters, ids_masks, (vocabulary, id_templates) = tipping.parse(
+        messages, templates_format="ids"
+    )
+    assert ids_clusters == clusters
+    assert ids_masks == masks
+    assert [{vocabulary[i] for i in ids} for ids in id_templates] == templates
+    assert vocabulary == sorted(vocabulary)
+    assert tipping.parse(
+        messages, return_templates=False, templates_format="ids"
+    )[2] == ([], [])
+
+
+def test_tokenizer_tokenize_many():
+    messages = [
+        "Fan fan_2 speed is set to 12.3114",
+        "on machine sys.node.fan_3 on node 12",
+        "",
+    ]
+    tokenizer = tipping.Tokenizer([r"fan_\d+"], [r"\d+\.\d+"], ".")
+    assert tokenizer.tokenize_many(messages) == [
+        tokenizer.tokenize(msg) for msg in messages
+    ]
+
+
+def test_parse_iter():
+    messages = [
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+        "Fan fan_1 speed is set to 12.3114 on machine node_1",
+        "Fan fan_2 speed is set to 9.1 on machine node_2",
+        "User carol logged in from 10.0.0.3",
+    ]
+    chunks = list(tipping.parse_iter(iter(messages), chunk_size=2))
+    assert [len(clusters) for clusters, _, _ in chunks] == [2, 2, 1]
+    templates = {}
+    for clusters, _, new_templates in chunks:
+        assert templates.keys().isdisjoint(new_templates.keys())
+        templates.update(new_templates)
+        assert all(c is None or c in templates for c in clusters)
+    assert len({frozenset(t) for t in templates.values()}) == len(templates)
+
+
+def test_parse_iter_merges_clusters_across_chunks():
+    messages = [
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+        "User carol logged in from 10.0.0.3",
+        "User dave logged in from 10.0.0.4",
+    ]
+    (first, _, first_templates), (second, _, second_templates) = tipping.parse_iter(
+        messages, chunk_size=2
+    )
+    assert first[0] is not None
+    assert second == first
+    assert len(first_templates) == 1
+    assert second_templates == {}
+
+
+def test_parse_iter_rejects_bad_chunk_size():
+    with pytest.raises(ValueError):
+        tipping.parse_iter([], chunk_size=0)
+
+
+def test_parse_cluster_ids_ndarray():
+    np = pytest.importorskip("numpy")
+    messages = [
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+        "",
+    ]
+    clusters, _, _ = tipping.parse(messages)
+    ids, _, _ = tipping.parse(messages, cluster_ids_format="ndarray")
+    assert ids.dtype == np.int32
+    assert ids.tolist() == [-1 if c is None else c for c in clusters]
+
+
+def test_parse_file(tmp_path):
+    messages = [
+        "User alice logged in from 10.0.0.1",
+        "User bob logged in from 10.0.0.2",
+        "Fan fan_1 speed is set to 12.3114 on machine node_1",
+    ]
+    path = tmp_path / "logs.txt"
+    path.write_text("\n".join(messages) + "\n")
+    assert tipping.parse_file(path) == tipping.parse(messages)
+
+
+def test_parse_non_ascii_messages():
+    messages = [
+        "Benutzer jürgen hat sich von 10.0.0.1 angemeldet",
+        "Benutzer zoë hat sich von 10.0.0.2 angemeldet",
+    ]
+    ascii_messages = [
+        "Benutzer jurgen hat sich von 10.0.0.1 angemeldet",
+        "Benutzer zoe hat sich von 10.0.0.2 angemeldet",
+    ]
+    clusters, _, templates = tipping.parse(messages)
+    ascii_clusters, _, ascii_templates = tipping.parse(ascii_messages)
+    assert clusters[0] is not None
+    assert clusters[0] == clusters[1]
+    assert clusters == ascii_clusters
+    assert templates == ascii_templates
+
+
+def test_parse_file_reports_invalid_line(tmp_path):
+    path = tmp_path / "logs.txt"
+    path.write_bytes(b"User alice logged in\nUser \xff logged in\n")
+    with pytest.raises(ValueError, match="line 2"):
+        tipping.parse_file(path)
+
+
+def test_parse_file_line_endings(tmp_path):
+    path = tmp_path / "logs.txt"
+    path.write_bytes(
+        b"User alice logged in from 10.0.0.1\r\nUser bob logged in from 10.0.0.2\r"
+    )
+    assert tipping.parse_file(path) == tipping.parse(
+        ["User alice logged in from 10.0.0.1", "User bob logged in from 10.0.0.2\r"]
+    )
@@ -1,15 +1,95 @@
-from typing import List, Optional, Set, Tuple
-from ._lib_tipping import token_independency_clusters as _token_independency_clusters
+import functools
+import itertools
+import os
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from ._lib_tipping import (
+    token_independency_clusters_prebuilt as _token_independency_clusters_prebuilt,
+)
+from ._lib_tipping import (
+    token_independency_clusters_file as _token_independency_clusters_file,
+)
 from ._lib_tipping import TokenFilter as _TokenFilter
 from ._lib_tipping import Computations as _Computation
 from ._lib_tipping import Tokenizer as _Tokenizer
 
+if TYPE_CHECKING:
+    import numpy
+
 
 __doc__ = _lib_tipping.__doc__
 if hasattr(_lib_tipping, "__all__"):
     __all__ = _lib_tipping.__all__
 
 
+@functools.lru_cache(maxsize=32)
+def _build_tokenizer(
+    special_whites: Tuple[str, ...],
+    special_blacks: Tuple[str, ...],
+    symbols: str,
+) -> _Tokenizer:
+    return _Tokenizer(list(special_whites), list(special_blacks), symbols)
+
+
+def _parse_setup(
+    special_whites: Optional[List[str]],
+    special_blacks: Optional[List[str]],
+    symbols: str,
+    keep_alphabetic: bool,
+    keep_numeric: bool,
+    keep_impure: bool,
+    return_templates: bool,
+    return_masks: bool,
+    templates_format: str,
+    cluster_ids_format: str,
+) -> Tuple[_Tokenizer, _TokenFilter, _Computation]:
+    if templates_format not in ("str", "ids"):
+        raise ValueError(f"Unknown templates format: {templates_format!r}")
+    if cluster_ids_format not in ("list", "ndarray"):
+        raise ValueError(f"Unknown cluster ids format: {cluster_ids_format!r}")
+    if cluster_ids_format == "ndarray":
+        import numpy  # noqa: F401 -- fail before parsing when numpy is missing
+
+    if special_blacks is None:
+        special_blacks = []
+
+    if special_whites is None:
+        special_whites = []
+
+    tokenizer = _build_tokenizer(tuple(special_whites), tuple(special_blacks), symbols)
+    filter = _TokenFilter(keep_alphabetic, keep_numeric, keep_impure)
+    computations = _Computation(
+        return_templates,
+        return_masks,
+        templates_format == "ids",
+        cluster_ids_format == "ndarray",
+    )
+    return tokenizer, filter, computations
+
+
+def _as_cluster_ids_format(
+    result: Tuple[object, List[str], object], cluster_ids_format: str
+) -> Tuple[object, List[str], object]:
+    if cluster_ids_format != "ndarray":
+        return result
+    import numpy
+
+    clusters, masks, templates = result
+    return numpy.frombuffer(clusters, dtype=numpy.int32), masks, templates
+
+
 def parse(
     messages: List[str],
     threshold: float = 0.5,
@@ -21,7 +101,14 @@ def parse(
     keep_impure: bool = False,
     return_templates: bool = True,
     return_masks: bool = True,
-) -> Tuple[List[Optional[int]], List[str], List[Set[str]]]:
+    templates_format: Literal["str", "ids"] = "str",
+    cluster_ids_format: Literal["list", "ndarray"] = "list",
+    n_threads: Optional[int] = None,
+) -> Tuple[
+    Union[List[Optional[int]], "numpy.ndarray"],
+    List[str],
+    Union[List[Set[str]], Tuple[List[str], List[FrozenSet[int]]]],
+]:
     """Parse the input list of messages into multiple clusters according to their key tokens.
 
     ### Arguments:
@@ -41,31 +128,188 @@ def parse(
         computations. Default = `False`
         return_templates (bool): a boolean indicating if template computation is required. Default = `True`
         return_masks (bool): a boolean indicating if mask computation is required. Default = `True`
+        templates_format (str): either `'str'` to return each template as a set of tokens, or `'ids'` to
+        return a shared, sorted token vocabulary alongside each template as a frozenset of vocabulary
+        indices. When `return_templates` is `False`, `'ids'` returns `([], [])`. Default = `'str'`
+        cluster_ids_format (str): either `'list'` to return cluster ids as a list of optional integers, or
+        `'ndarray'` to return them as a `numpy.ndarray` of `int32` where `-1` marks messages without a
+        cluster. Requires numpy. Default = `'list'`
+        n_threads (int): a positive number of threads used for parsing, or `None` to use all available
+        cores. The pool for the most recently used `n_threads` is kept and reused by later calls with
+        the same value, and replaced when the value changes. Default = `None`
 
 
     ### Returns:
         Tuple[List[Optional[int]], List[str], List[Set[str]]]: A tuple of three element where the first list
         of optional integers where for integer values are indications of cluster ids and `None` is used
         when the cluster couldn't be identified, and the second element is the corresponding parameter mask
-        for each message, and the third is an array where each element is a set of template.
+        for each message, and the third is an array where each element is a set of template. When
+        `templates_format` is `'ids'`, the third element is instead a pair of the token vocabulary and an
+        array where each element is a frozenset of indices into that vocabulary.
     """
-    if special_blacks is None:
-        special_blacks = []
-
-    if special_whites is None:
-        special_whites = []
-
-    filter = _TokenFilter(keep_alphabetic, keep_numeric, keep_impure)
-    computations = _Computation(return_templates, return_masks)
-    return _token_independency_clusters(
+    tokenizer, filter, computations = _parse_setup(
+        special_whites,
+        special_blacks,
+        symbols,
+        keep_alphabetic,
+        keep_numeric,
+        keep_impure,
+        return_templates,
+        return_masks,
+        templates_format,
+        cluster_ids_format,
+    )
+    result = _token_independency_clusters_prebuilt(
         messages,
         threshold,
+        tokenizer,
+        filter,
+        computations,
+        n_threads,
+    )
+    return _as_cluster_ids_format(result, cluster_ids_format)
+
+
+def parse_iter(
+    messages: Iterable[str],
+    chunk_size: int = 4096,
+    threshold: float = 0.5,
+    special_whites: List[str] = None,
+    special_blacks: List[str] = None,
+    symbols: str = "()[]{}=,*",
+    keep_alphabetic: bool = True,
+    keep_numeric: bool = False,
+    keep_impure: bool = False,
+    return_masks: bool = True,
+    n_threads: Optional[int] = None,
+) -> Iterator[Tuple[List[Optional[int]], List[str], Dict[int, Set[str]]]]:
+    """Lazily parse an iterable of messages in consecutive chunks of `chunk_size` messages.
+
+    Only one chunk is held in memory at a time, so `messages` may be a generator over a file
+    that does not fit in memory. Each chunk is parsed with `parse`, and its clusters are merged
+    into the clusters of the previous chunks by template: clusters with the same template share
+    a cluster id across the whole stream, and clusters with a new template get a new id.
+
+    Templates are computed from each chunk alone, so they can differ from the ones `parse` would
+    compute over the whole input. Messages that a whole-input parse puts in one cluster may
+    therefore end up with different ids here.
+
+    ### Arguments:
+        messages (Iterable[str]): an iterable of messages for parsing.
+        chunk_size (int): the maximum number of messages parsed at once. Default = `4096`
+
+        The remaining arguments are the same as `parse`. Templates are always computed, since
+        merging relies on them.
+
+    ### Returns:
+        Iterator[Tuple[List[Optional[int]], List[str], Dict[int, Set[str]]]]: for each chunk of
+        messages, in input order, the stream-wide cluster id and the parameter mask of every message
+        in the chunk, and a mapping from cluster id to template for the clusters first seen in that
+        chunk. Merging these mappings over all chunks gives the templates of the whole stream.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+
+    return _parse_chunks(
+        iter(messages),
+        chunk_size,
+        functools.partial(
+            parse,
+            threshold=threshold,
+            special_whites=special_whites,
+            special_blacks=special_blacks,
+            symbols=symbols,
+            keep_alphabetic=keep_alphabetic,
+            keep_numeric=keep_numeric,
+            keep_impure=keep_impure,
+            return_templates=True,
+            return_masks=return_masks,
+            n_threads=n_threads,
+        ),
+    )
+
+
+def _parse_chunks(
+    messages: Iterator[str],
+    chunk_size: int,
+    parse_chunk: Callable[
+        [List[str]], Tuple[List[Optional[int]], List[str], List[Set[str]]]
+    ],
+) -> Iterator[Tuple[List[Optional[int]], List[str], Dict[int, Set[str]]]]:
+    cluster_ids: Dict[FrozenSet[str], int] = {}
+    while True:
+        chunk = list(itertools.islice(messages, chunk_size))
+        if not chunk:
+            return
+        chunk_clusters, masks, chunk_templates = parse_chunk(chunk)
+        merged_ids = []
+        new_templates = {}
+        for template in chunk_templates:
+            key = frozenset(template)
+            if key not in cluster_ids:
+                cluster_ids[key] = len(cluster_ids)
+                new_templates[cluster_ids[key]] = template
+            merged_ids.append(cluster_ids[key])
+        clusters = [None if c is None else merged_ids[c] for c in chunk_clusters]
+        yield clusters, masks, new_templates
+
+
+def parse_file(
+    path: Union[str, "os.PathLike[str]"],
+    threshold: float = 0.5,
+    special_whites: List[str] = None,
+    special_blacks: List[str] = None,
+    symbols: str = "()[]{}=,*",
+    keep_alphabetic: bool = True,
+    keep_numeric: bool = False,
+    keep_impure: bool = False,
+    return_templates: bool = True,
+    return_masks: bool = True,
+    templates_format: Literal["str", "ids"] = "str",
+    cluster_ids_format: Literal["list", "ndarray"] = "list",
+    n_threads: Optional[int] = None,
+) -> Tuple[
+    Union[List[Optional[int]], "numpy.ndarray"],
+    List[str],
+    Union[List[Set[str]], Tuple[List[str], List[FrozenSet[int]]]],
+]:
+    """Parse every line of a UTF-8 text file as a message.
+
+    The whole file is read into memory in a single buffer, and its lines are handed to the parser
+    as borrowed slices, so no Python string is created per message. The file is not memory-mapped:
+    a log truncated in place while mapped (e.g. by logrotate's `copytruncate`) would crash the
+    interpreter. Lines end at `\\n` or `\\r\\n`, which are not part of the messages. Each line is
+    validated as UTF-8 on its own, and an invalid line raises a `ValueError` naming its line number.
+
+    ### Arguments:
+        path (str): the path of the log file to parse.
+
+        The remaining arguments are the same as `parse`.
+
+    ### Returns:
+        The same tuple as `parse`, with one entry per line of the file.
+    """
+    tokenizer, filter, computations = _parse_setup(
         special_whites,
         special_blacks,
         symbols,
+        keep_alphabetic,
+        keep_numeric,
+        keep_impure,
+        return_templates,
+        return_masks,
+        templates_format,
+        cluster_ids_format,
+    )
+    result = _token_independency_clusters_file(
+        os.fspath(path),
+        threshold,
+        tokenizer,
         filter,
         computations,
+        n_threads,
     )
+    return _as_cluster_ids_format(result, cluster_ids_format)
 
 
 class Tokenizer:
@@ -83,3 +327,6 @@ class Tokenizer:
 
     def tokenize(self, message: str) -> List[str]:
         return self.internal.tokenize(message)
+
+    def tokenize_many(self, messages: List[str]) -> List[List[str]]:
+        return self.internal.tokenize_many(messages)
@@ -1,46 +1,66 @@
-use std::collections::{HashMap, HashSet};
+use std::collections::{BTreeSet, HashMap, HashSet};
+use std::sync::{Arc, Mutex, OnceLock, PoisonError};
 
 use fancy_regex::Regex;
+use pyo3::exceptions::{PyOverflowError, PyValueError};
 use pyo3::prelude::*;
+use pyo3::types::{PyByteArray, PyFrozenSet, PyList, PyString};
+use rayon::prelude::*;
+use rayon::{ThreadPool, ThreadPoolBuilder};
 use tipping_rs::Tokenize;
 
 #[pyclass]
 pub struct Tokenizer {
-    internal: tipping_rs::Tokenizer,
+    internal: OnceLock<tipping_rs::Tokenizer>,
+    special_whites: Vec<Regex>,
+    special_blacks: Vec<Regex>,
+    symbols: String,
 }
 
 #[pymethods]
 impl Tokenizer {
     #[new]
     pub fn new(special_whites: Vec<String>, special_blacks: Vec<String>, symbols: String) -> Self {
+        let special_whites = compile_regexes(special_whites);
+        let special_blacks = compile_regexes(special_blacks);
         Self {
-            internal: tipping_rs::Tokenizer::new(
-                special_whites
-                    .into_iter()
-                    .map(|pattern| {
-                        Regex::new(&pattern)
-                            .unwrap_or_else(|_| panic!("Unable to compile {}", pattern))
-                    })
-                    .collect(),
-                special_blacks
-                    .into_iter()
-                    .map(|pattern| {
-                        Regex::new(&pattern)
-                            .unwrap_or_else(|_| panic!("Unable to compile {}", pattern))
-                    })
-                    .collect(),
-                symbols.chars().collect(),
-            ),
+            internal: OnceLock::new(),
+            special_whites,
+            special_blacks,
+            symbols,
         }
     }
 
-    pub fn tokenize(&self, msg: String) -> Vec<String> {
-        self
-            .internal
-            .tokenize(&msg)
-            .into_iter()
-            .map(|tok| tok.as_str().to_owned())
-            .collect()
+    pub fn tokenize<'py>(&self, py: Python<'py>, msg: &'py PyString) -> PyResult<&'py PyList> {
+        let tokens = self.internal().tokenize(msg.to_str()?);
+        Ok(PyList::new(py, tokens.iter().map(|tok| tok.as_str())))
+    }
+
+    pub fn tokenize_many<'py>(&self, py: Python<'py>, messages: Vec<&'py str>) -> &'py PyList {
+        let tokenized = py.allow_threads(|| {
+            messages
+                .par_iter()
+                .map(|msg| self.internal().tokenize(msg))
+                .collect::<Vec<_>>()
+        });
+        PyList::new(
+            py,
+            tokenized
+                .iter()
+                .map(|tokens| PyList::new(py, tokens.iter().map(|tok| tok.as_str()))),
+        )
+    }
+}
+
+impl Tokenizer {
+    fn internal(&self) -> &tipping_rs::Tokenizer {
+        self.internal.get_or_init(|| {
+            tipping_rs::Tokenizer::new(
+                self.special_whites.clone(),
+                self.special_blacks.clone(),
+                self.symbols.chars().collect(),
+            )
+        })
     }
 }
 
@@ -69,78 +89,158 @@ impl TokenFilter {
 pub struct Computations {
     template: bool,
     mask: bool,
+    template_ids: bool,
+    cluster_ids_array: bool,
 }
 
 #[pymethods]
 impl Computations {
     #[new]
-    fn new(template: bool, mask: bool) -> Self {
-        Self { mask, template }
+    #[pyo3(signature = (template, mask, template_ids=false, cluster_ids_array=false))]
+    fn new(template: bool, mask: bool, template_ids: bool, cluster_ids_array: bool) -> Self {
+        Self {
+            mask,
+            template,
+            template_ids,
+            cluster_ids_array,
+        }
     }
 }
 
 type MessageClusters = Vec<Option<usize>>;
 type ParameterMasks = Vec<String>;
 type ClusterTemplates = Vec<HashSet<String>>;
+type ParseOutput = (PyObject, ParameterMasks, PyObject);
 
 #[pyfunction]
+#[pyo3(signature = (messages, threshold, special_whites, special_blacks, symbols, filter, comps, n_threads=None))]
+#[allow(clippy::too_many_arguments)]
 fn token_independency_clusters(
-    messages: Vec<String>,
+    py: Python<'_>,
+    messages: Vec<&str>,
     threshold: f32,
     special_whites: Vec<String>,
     special_blacks: Vec<String>,
     symbols: String,
     filter: TokenFilter,
     comps: Computations,
-) -> PyResult<(MessageClusters, ParameterMasks, ClusterTemplates)> {
-    let special_blacks = special_blacks.into_iter().map(compile_regex).collect();
-    let special_whites = special_whites.into_iter().map(compile_regex).collect();
-    let symbols = symbols.chars().collect();
+    n_threads: Option<usize>,
+) -> PyResult<ParseOutput> {
+    let tokenizer = Tokenizer::new(special_whites, special_blacks, symbols);
+    parse_messages(
+        py, &messages, threshold, &tokenizer, filter, comps, n_threads,
+    )
+}
 
+#[pyfunction]
+#[pyo3(signature = (messages, threshold, tokenizer, filter, comps, n_threads=None))]
+fn token_independency_clusters_prebuilt(
+    py: Python<'_>,
+    messages: Vec<&str>,
+    threshold: f32,
+    tokenizer: PyRef<'_, Tokenizer>,
+    filter: TokenFilter,
+    comps: Computations,
+    n_threads: Option<usize>,
+) -> PyResult<ParseOutput> {
+    parse_messages(
+        py, &messages, threshold, &tokenizer, filter, comps, n_threads,
+    )
+}
+
+#[pyfunction]
+#[pyo3(signature = (path, threshold, tokenizer, filter, comps, n_threads=None))]
+fn token_independency_clusters_file(
+    py: Python<'_>,
+    path: &str,
+    threshold: f32,
+    tokenizer: PyRef<'_, Tokenizer>,
+    filter: TokenFilter,
+    comps: Computations,
+    n_threads: Option<usize>,
+) -> PyResult<ParseOutput> {
+    let contents = py.allow_threads(|| std::fs::read(path))?;
+    let messages = file_lines(&contents)?;
+    parse_messages(
+        py, &messages, threshold, &tokenizer, filter, comps, n_threads,
+    )
+}
+
+fn parse_messages(
+    py: Python<'_>,
+    messages: &[&str],
+    threshold: f32,
+    tokenizer: &Tokenizer,
+    filter: TokenFilter,
+    comps: Computations,
+    n_threads: Option<usize>,
+) -> PyResult<ParseOutput> {
     let parser = tipping_rs::Parser::default()
         .with_threshold(threshold)
-        .with_special_whites(special_whites)
-        .with_special_blacks(special_blacks)
-        .with_symbols(symbols)
+        .with_special_whites(tokenizer.special_whites.clone())
+        .with_special_blacks(tokenizer.special_blacks.clone())
+        .with_symbols(tokenizer.symbols.chars().collect())
         .with_filter_alphabetic(filter.alphabetic)
         .with_filter_numeric(filter.numeric)
         .with_filter_impure(filter.impure);
-    Ok(match comps {
+    let template_ids = comps.template_ids;
+    let cluster_ids_array = comps.cluster_ids_array;
+    let run = || match comps {
         Computations {
             template: false,
             mask: false,
+            ..
         } => {
-            let clusters = parser.parse(&messages);
+            let clusters = parser.parse(messages);
             (clusters, Default::default(), Default::default())
         }
         Computations {
             template: false,
             mask: true,
+            ..
         } => {
-            let (clusters, masks) = parser.compute_masks().parse(&messages);
+            let (clusters, masks) = parser.compute_masks().parse(messages);
             (
                 clusters,
-                one_to_one_masks(&messages, masks),
+                one_to_one_masks(messages, masks),
                 Default::default(),
             )
         }
         Computations {
             template: true,
             mask: false,
+            ..
         } => {
-            let (clusters, templates) = parser.compute_templates().parse(&messages);
+            let (clusters, templates) = parser.compute_templates().parse(messages);
             (clusters, Default::default(), templates)
         }
 
         Computations {
             template: true,
             mask: true,
+            ..
         } => {
             let (clusters, templates, masks) =
-                parser.compute_masks().compute_templates().parse(&messages);
-            (clusters, one_to_one_masks(&messages, masks), templates)
+                parser.compute_masks().compute_templates().parse(messages);
+            (clusters, one_to_one_masks(messages, masks), templates)
         }
-    })
+    };
+    let pool = n_threads.map(thread_pool).transpose()?;
+    let (clusters, masks, templates) = py.allow_threads(|| match pool {
+        Some(pool) => pool.install(run),
+        None => run(),
+    });
+    let templates = if template_ids {
+        interned_templates(py, templates)?
+    } else {
+        templates.into_py(py)
+    };
+    let clusters = if cluster_ids_array {
+        cluster_ids_int32_bytes(py, clusters)?
+    } else {
+        clusters.into_py(py)
+    };
+    Ok((clusters, masks, templates))
 }
 
 /// A Python module implemented in Rust.
@@ -148,24 +248,115 @@ fn token_independency_clusters(
 #[pyo3(name = "_lib_tipping")]
 fn tipping(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(token_independency_clusters, m)?)?;
+    m.add_function(wrap_pyfunction!(token_independency_clusters_prebuilt, m)?)?;
+    m.add_function(wrap_pyfunction!(token_independency_clusters_file, m)?)?;
     m.add_class::<TokenFilter>()?;
     m.add_class::<Computations>()?;
     m.add_class::<Tokenizer>()?;
     Ok(())
 }
 
-fn one_to_one_masks(messages: &[String], masks: HashMap<String, String>) -> Vec<String> {
+/// Splits a file into lines exactly like `str::lines`, validating each line as UTF-8 separately.
+fn file_lines(contents: &[u8]) -> PyResult<Vec<&str>> {
+    contents
+        .split_inclusive(|byte| *byte == b'\n')
+        .enumerate()
+        .map(|(index, line)| {
+            let line = match line.strip_suffix(b"\n") {
+                Some(line) => line.strip_suffix(b"\r").unwrap_or(line),
+                None => line,
+            };
+            std::str::from_utf8(line).map_err(|err| {
+                PyValueError::new_err(format!("Invalid UTF-8 on line {}: {}", index + 1, err))
+            })
+        })
+        .collect()
+}
+
+/// Returns a rayon pool with `n_threads` threads. Only the most recently used pool is kept, so
+/// repeated calls with the same `n_threads` reuse it and changing `n_threads` releases the old one.
+fn thread_pool(n_threads: usize) -> PyResult<Arc<ThreadPool>> {
+    static POOL: Mutex<Option<(usize, Arc<ThreadPool>)>> = Mutex::new(None);
+    if n_threads == 0 {
+        return Err(PyValueError::new_err("n_threads must be positive"));
+    }
+    let mut cached = POOL.lock().unwrap_or_else(PoisonError::into_inner);
+    if let Some((cached_threads, pool)) = cached.as_ref() {
+        if *cached_threads == n_threads {
+            return Ok(Arc::clone(pool));
+        }
+    }
+    let pool = ThreadPoolBuilder::new()
+        .num_threads(n_threads)
+        .build()
+        .map(Arc::new)
+        .map_err(|err| PyValueError::new_err(err.to_string()))?;
+    *cached = Some((n_threads, Arc::clone(&pool)));
+    Ok(pool)
+}
+
+fn one_to_one_masks(messages: &[&str], masks: HashMap<String, String>) -> Vec<String> {
     messages
         .iter()
         .map(|msg| {
             masks
-                .get(msg)
+                .get(*msg)
                 .map(ToOwned::to_owned)
                 .unwrap_or("0".repeat(msg.len()))
         })
         .collect::<Vec<_>>()
 }
 
+/// Packs cluster ids into native-endian `int32` bytes, with `-1` for unclustered messages, for
+/// the Python side to wrap with `numpy.frombuffer`.
+fn cluster_ids_int32_bytes(py: Python<'_>, clusters: MessageClusters) -> PyResult<PyObject> {
+    let mut bytes = Vec::with_capacity(clusters.len() * std::mem::size_of::<i32>());
+    for cluster in clusters {
+        let id = match cluster {
+            Some(id) => {
+                i32::try_from(id).map_err(|err| PyOverflowError::new_err(err.to_string()))?
+            }
+            None => -1,
+        };
+        bytes.extend_from_slice(&id.to_ne_bytes());
+    }
+    Ok(PyByteArray::new(py, &bytes).into_py(py))
+}
+
+fn interned_templates(py: Python<'_>, templates: ClusterTemplates) -> PyResult<PyObject> {
+    let vocabulary = templates
+        .iter()
+        .flatten()
+        .map(String::as_str)
+        .collect::<BTreeSet<_>>()
+        .into_iter()
+        .collect::<Vec<_>>();
+    let templates = templates
+        .iter()
+        .map(|template| {
+            let ids = template
+                .iter()
+                .map(|token| {
+                    vocabulary
+                        .binary_search(&token.as_str())
+                        .expect("every template token is in the vocabulary")
+                })
+                .collect::<Vec<_>>();
+            PyFrozenSet::new(py, &ids)
+        })
+        .collect::<PyResult<Vec<_>>>()?;
+    Ok((vocabulary, templates).into_py(py))
+}
+
+fn compile_regexes(patterns: Vec<String>) -> Vec<Regex> {
+    let mut seen = HashSet::new();
+    patterns
+        .into_iter()
+        .filter(|pattern| seen.insert(pattern.clone()))
+        .map(compile_regex)
+        .collect()
+}
+
 fn compile_regex(re: impl AsRef<str>) -> Regex {
     match Regex::new(re.as_ref()) {
         Ok(regex) => regex,